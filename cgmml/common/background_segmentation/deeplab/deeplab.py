@@ -9,8 +9,7 @@ import numpy as np
 from PIL import Image
 import pickle
 
-import tensorflow.compat.v1 as tf
-tf.disable_v2_behavior()
+import tensorflow as tf
 
 
 class DeepLabModel(object):
@@ -23,7 +22,6 @@ class DeepLabModel(object):
 
     def __init__(self, tarball_path):
         """Creates and loads pretrained deeplab model."""
-        self.graph = tf.Graph()
 
         graph_def = None
         # Extract frozen graph from tar archive.
@@ -31,7 +29,7 @@ class DeepLabModel(object):
         for tar_info in tar_file.getmembers():
             if self.FROZEN_GRAPH_NAME in os.path.basename(tar_info.name):
                 file_handle = tar_file.extractfile(tar_info)
-                graph_def = tf.GraphDef.FromString(file_handle.read())
+                graph_def = tf.compat.v1.GraphDef.FromString(file_handle.read())
                 break
 
         tar_file.close()
@@ -39,10 +37,16 @@ class DeepLabModel(object):
         if graph_def is None:
             raise RuntimeError('Cannot find inference graph in tar archive.')
 
-        with self.graph.as_default():
-            tf.import_graph_def(graph_def, name='')
-
-        self.sess = tf.Session(graph=self.graph)
+        # Wrap the frozen graph in a callable tf.function instead of running it
+        # through a v1 Session. This keeps eager (v2) behavior enabled for the
+        # rest of the process and lets TF prune/optimize the inference subgraph.
+        self._infer = tf.compat.v1.wrap_function(
+            lambda images: tf.compat.v1.import_graph_def(
+                graph_def,
+                name='',
+                input_map={self.INPUT_TENSOR_NAME: images},
+                return_elements=[self.OUTPUT_TENSOR_NAME])[0],
+            signature=[tf.TensorSpec(shape=(None, None, None, 3), dtype=tf.uint8)])
 
     def run(self, image):
         """Runs inference on a single image.
@@ -54,14 +58,33 @@ class DeepLabModel(object):
             resized_image: RGB image resized from original input image.
             seg_map: Segmentation map of `resized_image`.
         """
-        width, height = image.size
+        resized_images, seg_maps = self.run_batch([image])
+        return resized_images[0], seg_maps[0]
+
+    def run_batch(self, images):
+        """Runs inference on a batch of equally-sized images in one graph call.
+
+        Batching amortizes the per-call graph dispatch overhead and keeps the
+        GPU busy, instead of paying it once per image.
+
+        Args:
+            images: A non-empty list of PIL.Image objects, all of the same size.
+
+        Returns:
+            resized_images: RGB images resized from the original input images.
+            seg_maps: Segmentation maps, one per image.
+        """
+        assert len(images) > 0
+        sizes = set(image.size for image in images)
+        assert len(sizes) == 1, 'run_batch expects equally-sized images, got: {}'.format(sizes)
+
+        width, height = images[0].size
         resize_ratio = 1.0 * self.INPUT_SIZE / max(width, height)
         target_size = (int(resize_ratio * width), int(resize_ratio * height))
-        resized_image = image.convert('RGB').resize(target_size, Image.ANTIALIAS)
-        batch_seg_map = self.sess.run(self.OUTPUT_TENSOR_NAME,
-                                      feed_dict={self.INPUT_TENSOR_NAME: [np.asarray(resized_image)]})
-        seg_map = batch_seg_map[0]
-        return resized_image, seg_map
+        resized_images = [image.convert('RGB').resize(target_size, Image.ANTIALIAS) for image in images]
+        batch = np.stack([np.asarray(resized_image) for resized_image in resized_images])
+        batch_seg_map = self._infer(tf.convert_to_tensor(batch, dtype=tf.uint8)).numpy()
+        return resized_images, list(batch_seg_map)
 
 
 def create_pascal_label_colormap():
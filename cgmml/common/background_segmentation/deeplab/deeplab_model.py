@@ -1,6 +1,7 @@
+import hashlib
 import os
+import shutil
 import urllib3
-import tensorflow.compat.v1 as tf
 from cgmml.common.background_segmentation.deeplab.deeplab import DeepLabModel, label_to_color_image
 
 import numpy as np
@@ -11,28 +12,74 @@ MODEL_MIRROR = 'http://download.tensorflow.org/models/'
 MODEL_FILE = 'deeplabv3_pascal_trainval_2018_01_04.tar.gz'
 PERSON_SEGMENTATION = 15
 
+# One shared pool, so repeated downloads reuse the HTTP keep-alive connection.
+_http = urllib3.PoolManager()
+
 
 def download_file(url, path):
-    stream = urllib3.PoolManager().request('GET', url, preload_content=False)
+    stream = _http.request('GET', url, preload_content=False)
     with open(path, 'wb') as output:
-        while True:
-            data = stream.read(CHUNK_SIZE)
-            if not data:
-                break
-            output.write(data)
+        shutil.copyfileobj(stream, output, length=CHUNK_SIZE)
     stream.release_conn()
 
 
+def is_download_current(url, path):
+    """Verify a previous download against the server's Content-Length.
+
+    Returns True when the local file exists and its size matches, so complete
+    downloads are skipped while truncated ones are retried. If the server
+    cannot be reached (or sends no Content-Length), an existing file is
+    trusted as-is.
+    """
+    if not os.path.isfile(path):
+        return False
+    try:
+        response = _http.request('HEAD', url)
+    except urllib3.exceptions.HTTPError:
+        return True
+    content_length = response.headers.get('Content-Length')
+    if content_length is None:
+        return True
+    return os.path.getsize(path) == int(content_length)
+
+
 def get_deeplab_model():
-    if not os.path.isfile(MODEL_FILE):
+    if not is_download_current(MODEL_MIRROR + MODEL_FILE, MODEL_FILE):
         download_file(MODEL_MIRROR + MODEL_FILE, MODEL_FILE)
-    tf.disable_v2_behavior()
     return DeepLabModel(MODEL_FILE)
 
 
-def render(model, rgb_file: str, angle: int) -> np.array:
+# Segmentation results are persisted here keyed by file content hash, so
+# re-runs over the same artifacts (e.g. the same testset evaluated with
+# several pipelines) skip inference without growing process memory.
+SEG_MAP_CACHE_DIR = 'segmentation_cache'
+
+
+def get_seg_map(model, rgb_file: str, angle: int):
+    """Segment an RGB file, reusing the on-disk cached result when the content was seen before.
+
+    The key is the hash of the file content (not the path), so renamed or
+    re-downloaded copies of the same image hit the cache too. Results are
+    stored as compressed .npz files on disk rather than in memory; a run
+    over tens of thousands of images stays at constant memory usage.
+    """
+    with open(rgb_file, 'rb') as rgb:
+        content_hash = hashlib.md5(rgb.read()).hexdigest()
+    cache_fpath = os.path.join(SEG_MAP_CACHE_DIR, '{}_{}.npz'.format(content_hash, angle))
+
+    if os.path.isfile(cache_fpath):
+        cached = np.load(cache_fpath)
+        return Image.fromarray(cached['resized_im']), cached['seg_map']
+
     im = Image.open(rgb_file).rotate(angle, expand=True)
     resized_im, seg_map = model.run(im)
+    os.makedirs(SEG_MAP_CACHE_DIR, exist_ok=True)
+    np.savez_compressed(cache_fpath, resized_im=np.asarray(resized_im), seg_map=seg_map.astype(np.uint8))
+    return resized_im, seg_map
+
+
+def render(model, rgb_file: str, angle: int) -> np.array:
+    resized_im, seg_map = get_seg_map(model, rgb_file, angle)
     seg_map = label_to_color_image(seg_map).astype(np.uint8)
     mixed = np.copy(resized_im)
     mixed[seg_map == 0] = 0
@@ -310,13 +310,9 @@ class ETLDataGenerator(object):
                                     [-sinval, cosval, 0],
                                     [0, 0, 1]])
 
-        rotated_data = np.zeros(point_cloud.shape, dtype=np.float32)
-        for k in range(point_cloud.shape[0]):
-
-            shape_pc = point_cloud[k, ...]
-            rotated_data[k, ...] = np.dot(shape_pc.reshape((-1, 3)), rotation_matrix)
-
-        return rotated_data
+        # One matmul over all points at once; the per-point Python loop was the bottleneck.
+        rotated_data = np.dot(point_cloud.reshape((-1, 3)), rotation_matrix)
+        return rotated_data.reshape(point_cloud.shape).astype(np.float32)
 
 
 def create_datagenerator_from_parameters(dataset_path, dataset_parameters):
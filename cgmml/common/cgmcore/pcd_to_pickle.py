@@ -2,7 +2,7 @@ import pickle
 import pandas as pd
 import numpy as np
 from pyntcloud import PyntCloud
-import pathlib
+from concurrent.futures import ProcessPoolExecutor
 import os
 import logging
 
@@ -17,20 +17,115 @@ source_path = '/mnt/depthmap/pcd_50k/'
 target_path = '/mnt/depthmap/pcd_50k/pcd_50k_pkl'
 dataset = '../../gitrepo/cgm-ml-service/dataset_EDA/opensource_pcd_data/artifacts.csv'
 
-if not os.path.exists(target_path):
-    os.mkdir(target_path)
+os.makedirs(target_path, exist_ok=True)
+
+_created_dirs = set()
+
+
+def ensure_dir(path):
+    """
+    Creates a directory once and remembers it, so per-entry mkdir syscalls are skipped.
+    """
+    if path not in _created_dirs:
+        os.makedirs(path, exist_ok=True)
+        _created_dirs.add(path)
 
 
 def load_pcd_as_ndarray(pcd_path):
     """
     Loads a PCD-file. Yields a numpy-array.
+
+    ASCII PCD-files are parsed with a single vectorized np.loadtxt call.
+    Binary PCD-files still go through PyntCloud.
     """
+    num_header_lines = 0
+    data_format = None
+    with open(pcd_path, "rb") as pcd_file:
+        for line in pcd_file:
+            num_header_lines += 1
+            if line.startswith(b"DATA"):
+                data_format = line.split()[1].decode()
+                break
+
+    if data_format == "ascii":
+        return np.loadtxt(pcd_path, dtype="float32", skiprows=num_header_lines, ndmin=2)
+
     pointcloud = PyntCloud.from_file(pcd_path)
     values = pointcloud.points.values
     return values
 
 
-def pcd_to_pickle(dataset):
+def process_pcd_entry(entry):
+    """
+    Processes a single csv row: loads the PCD and writes the pickle file.
+
+    Top-level function so it can be pickled into worker processes.
+
+    Only file and parse errors are caught (and logged with the path, so the
+    broken artifacts can be fixed instead of silently failing again on every
+    run); anything else, including KeyboardInterrupt, propagates and aborts.
+
+    Returns True on success, False when the entry had to be skipped.
+    """
+    pcd_path = source_path + entry['storage_path']
+
+    try:
+        # float32 is plenty for sensor data and halves the pickle size on disk.
+        # A C-contiguous array lets pickle write the buffer as one memcpy
+        # instead of serializing element by element.
+        pointcloud = np.ascontiguousarray(load_pcd_as_ndarray(pcd_path), dtype="float32")
+        label = np.array([float(entry['height']), float(entry['weight'])], dtype="float32")
+        qrcode_path = os.path.join(target_path, entry['qrcode'])
+        pickle_filename = os.path.basename(entry['artifacts']).replace(".pcd", ".p")
+        ensure_dir(qrcode_path)
+        pickle_output_path = os.path.join(qrcode_path, pickle_filename)
+        pickle.dump((pointcloud, label), open(pickle_output_path, "wb"), protocol=pickle.HIGHEST_PROTOCOL)
+    except (OSError, ValueError) as error:
+        logger.warning("Skipping %s: %s: %s", pcd_path, type(error).__name__, error)
+        return False
+    return True
+
+
+def process_qrcode_shard(item):
+    """
+    Writes all pointclouds of one QR-code into a single compressed .npz shard.
+
+    Top-level function so it can be pickled into worker processes.
+    """
+    qrcode, entries = item
+    arrays = {}
+    for entry in entries:
+        pcd_path = source_path + entry['storage_path']
+        pointcloud = np.ascontiguousarray(load_pcd_as_ndarray(pcd_path), dtype="float32")
+        name = os.path.basename(entry['artifacts']).replace(".pcd", "")
+        arrays[name] = pointcloud
+        arrays[name + "_label"] = np.array([float(entry['height']), float(entry['weight'])], dtype="float32")
+    np.savez_compressed(os.path.join(target_path, qrcode + ".npz"), **arrays)
+
+
+def pcd_to_npz(dataset, number_of_workers=None):
+    """
+    Sharded variant of pcd_to_pickle: writes one .npz file per QR-code instead
+    of one pickle per artifact.
+
+    Tens of thousands of tiny pickle files are slow to stat and read on a
+    networked filesystem; a shard per QR-code turns those into a few large
+    sequential reads. Each shard maps the artifact basename to its pointcloud
+    and "<basename>_label" to the (height, weight) targets.
+
+    --dataset: A csv file conataining height, weight, qrcode, storage path for pcd
+    """
+    data = pd.read_csv(dataset)
+    groups = [(qrcode, group.to_dict("records")) for qrcode, group in data.groupby("qrcode")]
+    if number_of_workers is None:
+        number_of_workers = os.cpu_count()
+    logger.info("Using %d workers.", number_of_workers)
+
+    with ProcessPoolExecutor(max_workers=number_of_workers) as executor:
+        list(executor.map(process_qrcode_shard, groups))
+
+
+def pcd_to_pickle(dataset, number_of_workers=None):
     """
     --dataset: A csv file conataining height, weight, qrcode, storage path for pcd
 
@@ -38,15 +133,19 @@ def pcd_to_pickle(dataset):
     -- folder with pickle file having pointcloud, height and weight
     """
     data = pd.read_csv(dataset)
-    for index, rows in data.iterrows():
-        pcd_path = source_path + rows['storage_path']
-        pointcloud = load_pcd_as_ndarray(pcd_path)
-        label = np.array([float(rows['height']), float(rows['weight'])])
-        qrcode_path = os.path.join(target_path, rows['qrcode'])
-        pickle_filename = os.path.basename(rows['artifacts']).replace(".pcd", ".p")
-        pathlib.Path(qrcode_path).mkdir(parents=True, exist_ok=True)
-        pickle_output_path = os.path.join(qrcode_path, pickle_filename)
-        pickle.dump((pointcloud, label), open(pickle_output_path, "wb"))
+    entries = data.to_dict("records")
+    if number_of_workers is None:
+        number_of_workers = os.cpu_count()
+    logger.info("Using %d workers.", number_of_workers)
+
+    # Big chunks amortize the per-task message overhead between the processes.
+    chunksize = max(1, len(entries) // (number_of_workers * 8))
+    with ProcessPoolExecutor(max_workers=number_of_workers) as executor:
+        results = list(executor.map(process_pcd_entry, entries, chunksize=chunksize))
+
+    number_of_failures = results.count(False)
+    if number_of_failures != 0:
+        logger.warning("Skipped %d of %d entries, see the warnings above.", number_of_failures, len(results))
 
 
 def main():
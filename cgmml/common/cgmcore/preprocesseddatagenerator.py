@@ -15,6 +15,7 @@ import progressbar
 from pyntcloud import PyntCloud
 import multiprocessing as mp
 import pickle
+import tensorflow as tf
 from . import utils
 from bunch import Bunch
 
@@ -24,6 +25,11 @@ handler = logging.StreamHandler()
 handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s - %(pathname)s: line %(lineno)d'))
 logger.addHandler(handler)
 
+# QR-code scan results keyed by (dataset_path, filter). Subset-training loops
+# build a fresh generator per subset; the globbing of thousands of pickle
+# files only has to happen once per dataset.
+_QRCODE_SCAN_CACHE = {}
+
 
 class PreprocessedDataGenerator(object):
     """
@@ -110,12 +116,17 @@ class PreprocessedDataGenerator(object):
         self.rgbmap_scale_factor = rgbmap_scale_factor
         self.rgbmap_axis = rgbmap_axis
 
-        # Find all QR-codes.
-        self._find_qrcodes()
-        assert self.qrcodes != [], "No QR-codes found!"
-
-        # Prepare the data.
-        self._prepare_qrcodes_dictionary()
+        # Find all QR-codes and their files. Reuse a previous scan if available.
+        cache_key = (self.dataset_path, self.filter)
+        if cache_key in _QRCODE_SCAN_CACHE:
+            self.qrcodes, self.qrcodes_dictionary = _QRCODE_SCAN_CACHE[cache_key]
+            self.all_pcd_paths = []
+            self.all_jpg_paths = []
+        else:
+            self._find_qrcodes()
+            assert self.qrcodes != [], "No QR-codes found!"
+            self._prepare_qrcodes_dictionary()
+            _QRCODE_SCAN_CACHE[cache_key] = (self.qrcodes, self.qrcodes_dictionary)
 
     def _find_qrcodes(self):
         """
@@ -249,13 +260,9 @@ class PreprocessedDataGenerator(object):
                                     [-sinval, cosval, 0],
                                     [0, 0, 1]])
 
-        rotated_data = np.zeros(point_cloud.shape, dtype=np.float32)
-        for k in range(point_cloud.shape[0]):
-
-            shape_pc = point_cloud[k, ...]
-            rotated_data[k, ...] = np.dot(shape_pc.reshape((-1, 3)), rotation_matrix)
-
-        return rotated_data
+        # One matmul over all points at once; the per-point Python loop was the bottleneck.
+        rotated_data = np.dot(point_cloud.reshape((-1, 3)), rotation_matrix)
+        return rotated_data.reshape(point_cloud.shape).astype(np.float32)
 
     def finish(self):
         if hasattr(self, "pool"):
@@ -436,6 +443,61 @@ def get_input(class_self, pointcloud):
     return x_input
 
 
+@tf.function(jit_compile=True)
+def normalize_pointcloud(pointcloud):
+    """
+    Centers a pointcloud and scales it into the unit sphere.
+
+    Compiled with XLA so the subtract-mean and divide-by-max-norm steps fuse
+    into a single kernel instead of launching one per small op.
+    """
+    pointcloud = pointcloud - tf.reduce_mean(pointcloud, axis=0)
+    max_norm = tf.reduce_max(tf.norm(pointcloud, axis=1))
+    return pointcloud / tf.maximum(max_norm, 1e-8)
+
+
+def create_tf_dataset(
+        preprocessed_paths,
+        output_targets=["height"],
+        pointcloud_target_size=32000,
+        pointcloud_subsampling_method="random",
+        shuffle_buffer_size=64,
+        normalize=False):
+    """
+    Builds a tf.data pipeline over preprocessed pickle files.
+
+    Unlike generate(), which feeds Keras from a single-threaded Python
+    generator, this pipeline decodes and subsamples the pickles in parallel
+    and prefetches ahead of the training step, so the GPU is not starved by
+    the input side. Batch with .batch(batch_size) before passing to fit().
+
+    With normalize=True every cloud is additionally centered and scaled into
+    the unit sphere in-graph (see normalize_pointcloud).
+    """
+
+    def py_load_pickle(path):
+        with open(path.numpy(), "rb") as file:
+            (pointcloud, targets) = load_pointcloud_and_target(file, output_targets)
+        pointcloud = utils.subsample_pointcloud(
+            pointcloud, pointcloud_target_size, pointcloud_subsampling_method)
+        return pointcloud.astype("float32"), np.asarray(targets, dtype="float32")
+
+    def tf_load_pickle(path):
+        pointcloud, targets = tf.py_function(py_load_pickle, [path], [tf.float32, tf.float32])
+        pointcloud.set_shape((pointcloud_target_size, 3))
+        targets.set_shape((len(output_targets),))
+        return pointcloud, targets
+
+    dataset = tf.data.Dataset.from_tensor_slices([str(path) for path in preprocessed_paths])
+    dataset = dataset.map(tf_load_pickle, num_parallel_calls=tf.data.experimental.AUTOTUNE)
+    if normalize:
+        dataset = dataset.map(lambda pointcloud, targets: (normalize_pointcloud(pointcloud), targets),
+                              num_parallel_calls=tf.data.experimental.AUTOTUNE)
+    dataset = dataset.shuffle(shuffle_buffer_size)
+    dataset = dataset.prefetch(tf.data.experimental.AUTOTUNE)
+    return dataset
+
+
 def create_datagenerator_from_parameters(dataset_path, dataset_parameters):
     logger.info("Creating data-generator...")
     datagenerator = PreprocessedDataGenerator(
@@ -49,7 +49,22 @@ logger.addHandler(handler)
 def load_pcd_as_ndarray(pcd_path):
     """
     Loads a PCD-file. Yields a numpy-array.
+
+    ASCII PCD-files are parsed with a single vectorized np.loadtxt call.
+    Binary PCD-files still go through PyntCloud.
     """
+    num_header_lines = 0
+    data_format = None
+    with open(pcd_path, "rb") as pcd_file:
+        for line in pcd_file:
+            num_header_lines += 1
+            if line.startswith(b"DATA"):
+                data_format = line.split()[1].decode()
+                break
+
+    if data_format == "ascii":
+        return np.loadtxt(pcd_path, dtype="float32", skiprows=num_header_lines, ndmin=2)
+
     pointcloud = PyntCloud.from_file(pcd_path)
     values = pointcloud.points.values
     return values
@@ -75,8 +90,8 @@ def subsample_pointcloud(pointcloud, target_size, subsampling_method="random", d
 
     # Random subsampling.
     if subsampling_method == "random":
-        indices = np.arange(0, pointcloud.shape[0])
-        indices = np.random.choice(indices, target_size)
+        # Draw indices directly instead of materializing an arange first.
+        indices = np.random.randint(0, pointcloud.shape[0], target_size)
         result = pointcloud[indices]
 
     elif subsampling_method == "first":
@@ -84,7 +99,6 @@ def subsample_pointcloud(pointcloud, target_size, subsampling_method="random", d
         result[:len(pointcloud), :] = pointcloud[:target_size]
 
     elif subsampling_method == "sequential_skip":
-        result = np.zeros((target_size, pointcloud.shape[1]), dtype="float32")
         skip = max(1, round(len(pointcloud) / target_size))
         pointcloud_skipped = pointcloud[::skip, :]
         result = np.zeros((target_size, pointcloud.shape[1]), dtype="float32")
@@ -542,7 +556,7 @@ def multiprocess(
             # Results found. Playing it safe. Use pickle.
             else:
                 pickle_path = str(uuid.uuid4()) + ".pickletemp"
-                pickle.dump(result, open(pickle_path, "wb"))
+                pickle.dump(result, open(pickle_path, "wb"), protocol=pickle.HIGHEST_PROTOCOL)
                 output.put(pickle_path)
 
         # Handle keyboard interrupt.
@@ -165,6 +165,6 @@ class ArtifactProcessor:
         # Write into pickle
         pickle_output_full_path = f"{self.output_dir}/{pickle_output_path}"
         Path(pickle_output_full_path).parent.mkdir(parents=True, exist_ok=True)
-        pickle.dump((layers, target_dict), open(pickle_output_full_path, "wb"))
+        pickle.dump((layers, target_dict), open(pickle_output_full_path, "wb"), protocol=pickle.HIGHEST_PROTOCOL)
 
         return pickle_output_full_path
@@ -7,7 +7,10 @@ import tempfile
 from typing import List, Optional, Tuple
 from pathlib import Path
 
+import cv2
 from scipy import ndimage
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 import numpy as np
 from PIL import Image
 
@@ -27,6 +30,9 @@ SCREEN_BORDER_MARGIN_PERCENTAGE = 0.05
 SCREEN_BORDER_PERCENTAGE = 0.025
 TOOLKIT_DIR = Path(__file__).parents[0].absolute()
 
+SMOOTHING_FILTER = np.array([[0, 1, 0], [1, 1, 1], [0, 1, 0]]) / 5.
+SMOOTHING_STRUCTURE = SMOOTHING_FILTER > 0.
+
 
 Segment = namedtuple('Segment', 'id aabb')
 
@@ -49,23 +55,12 @@ def smoothen_depthmap_array(image_arr: np.ndarray) -> np.ndarray:
     """
 
     # Apply a convolution
-    conv_filter = np.array([[0, 1, 0], [1, 1, 1], [0, 1, 0]])
-    conv_filter = conv_filter / conv_filter.sum()
-    smooth_image_arr = ndimage.convolve(image_arr, conv_filter)
-
-    # Create mask which is 0 if any of the pixels in the convolution is 0
-    smooth_center = (image_arr == 0.)
-    smooth_right = np.zeros(image_arr.shape, dtype=bool)
-    smooth_left = np.zeros(image_arr.shape, dtype=bool)
-    smooth_up = np.zeros(image_arr.shape, dtype=bool)
-    smooth_down = np.zeros(image_arr.shape, dtype=bool)
-    smooth_right[1:, :] = smooth_center[:-1, :]
-    smooth_left[:-1, :] = smooth_center[1:, :]
-    smooth_up[:, 1:] = smooth_center[:, :-1]
-    smooth_down[:, :-1] = smooth_center[:, 1:]
-    mask = (smooth_center | smooth_right | smooth_left | smooth_up | smooth_down)
-
-    # Apply mask
+    smooth_image_arr = ndimage.convolve(image_arr, SMOOTHING_FILTER)
+
+    # Zero the result where any of the pixels in the convolution is 0:
+    # a one-pixel dilation of the zero-mask replaces the five shifted
+    # boolean arrays the old implementation allocated.
+    mask = ndimage.binary_dilation(image_arr == 0., structure=SMOOTHING_STRUCTURE)
     smooth_image_arr[mask] = 0.
 
     return smooth_image_arr
@@ -112,18 +107,19 @@ class Depthmap:
         self.width = width
         self.height = height
 
+        # Plain Python floats, so per-call arithmetic on them stays on
+        # NumPy's scalar fast path instead of boxing 0-d arrays
         sensor = 1
-        intrinsics = np.array(intrinsics)
-        self.fx = intrinsics[sensor, 0] * width
-        self.fy = intrinsics[sensor, 1] * height
-        self.cx = intrinsics[sensor, 2] * width
-        self.cy = intrinsics[sensor, 3] * height
+        self.fx = float(intrinsics[sensor][0]) * width
+        self.fy = float(intrinsics[sensor][1]) * height
+        self.cx = float(intrinsics[sensor][2]) * width
+        self.cy = float(intrinsics[sensor][3]) * height
 
         self.depth_scale = depth_scale
         self.max_confidence = max_confidence
         self.device_pose = device_pose
         if self.device_pose:
-            self.device_pose_arr = np.array(device_pose).reshape(4, 4).T
+            self.device_pose_arr = np.array(device_pose, dtype=np.float32).reshape(4, 4).T
         else:
             self.device_pose_arr = None
         if header:
@@ -132,6 +128,13 @@ class Depthmap:
         self.rgb_fpath = rgb_fpath
         self.rgb_array = rgb_array  # shape (width, height, 3)  # (240, 180, 3)
 
+        # Lazily built per-pixel projection grids (see _pixel_to_camera_factors),
+        # a scratch buffer and the memoized results of convert_2d_to_3d_oriented
+        self._x_factor = None
+        self._y_factor = None
+        self._points_4d = None
+        self._p3d_cache = {}
+
         assert depthmap_arr is not None or data is not None
         self.depthmap_arr = self._parse_depth_data(data) if data else depthmap_arr  # (240, 180)
 
@@ -171,8 +174,9 @@ class Depthmap:
             pil_im = pil_im.rotate(-90, expand=True)
             rgb_height, rgb_width = pil_im.width, pil_im.height  # Weird switch
             assert rgb_width / width == rgb_height / height, f'{rgb_width} / {width} != {rgb_height} / {height}'
-            pil_im = pil_im.resize((height, width), Image.ANTIALIAS)
-            rgb_array = np.asarray(pil_im)
+            # cv2.resize is SIMD-vectorized; INTER_AREA is the appropriate
+            # filter for downscaling camera photos to depthmap resolution
+            rgb_array = cv2.resize(np.asarray(pil_im), (height, width), interpolation=cv2.INTER_AREA)
         else:
             rgb_array = None
         return rgb_array
@@ -234,25 +238,30 @@ class Depthmap:
             3D points: shape (3, width, height)
         """
 
-        # Get depth of the neighbor pixels
-        dim_w = self.width - 1
-        dim_h = self.height - 1
-        depth_center = points_3d_arr[:, 1:, 1:].reshape(3, dim_w * dim_h)
-        depth_x_minus = points_3d_arr[:, 0:-1, 1:].reshape(3, dim_w * dim_h)
-        depth_y_minus = points_3d_arr[:, 1:, 0:-1].reshape(3, dim_w * dim_h)
-
-        # Calculate a normal of the triangle
-        vector_u = depth_center - depth_x_minus
-        vector_v = depth_center - depth_y_minus
-
-        normal = np.cross(vector_u, vector_v, axisa=0, axisb=0, axisc=0)
+        # Backward differences to the neighbor pixels, taken on 2D views
+        # without flattening copies
+        depth_center = points_3d_arr[:, 1:, 1:]
+        vector_u = depth_center - points_3d_arr[:, 0:-1, 1:]
+        vector_v = depth_center - points_3d_arr[:, 1:, 0:-1]
+
+        # Explicit cross product components; np.cross on axis 0 is much
+        # slower because it has to handle arbitrary dimensionality
+        normal_x = vector_u[1] * vector_v[2] - vector_u[2] * vector_v[1]
+        normal_y = vector_u[2] * vector_v[0] - vector_u[0] * vector_v[2]
+        normal_z = vector_u[0] * vector_v[1] - vector_u[1] * vector_v[0]
+        normal = np.stack([normal_x, normal_y, normal_z], axis=0)
+
+        # Zero out normals touching pixels without measured depth; they would
+        # otherwise normalize to arbitrary unit vectors and pollute the
+        # mostly-vertical selection in get_floor_level
+        depth = self.depthmap_arr_smooth
+        valid = (depth[1:, 1:] > 0) & (depth[:-1, 1:] > 0) & (depth[1:, :-1] > 0)
+        normal = normal * valid
 
         normal = normalize(normal)
 
-        normal = normal.reshape(3, dim_w, dim_h)
-
         # add black border to keep the dimensionality
-        output = np.zeros((3, self.width, self.height))
+        output = np.zeros((3, self.width, self.height), dtype=np.float32)
         output[:, 1:, 1:] = normal
         return output
 
@@ -279,29 +288,55 @@ class Depthmap:
 
         Returns:
             array of 3D points: shape(3, width, height)
+            The array is memoized per should_smooth flag and shared between
+            callers (detect_floor, detect_objects, get_floor_level,
+            get_highest_point); treat it as read-only.
         """
-        depth = self.depthmap_arr_smooth if should_smooth else self.depthmap_arr  # shape: (width, height)
+        cached = self._p3d_cache.get(should_smooth)
+        if cached is not None:
+            return cached
 
-        xbig = np.expand_dims(np.array(range(self.width)), -1).repeat(self.height, axis=1)  # shape: (width, height)
-        ybig = np.expand_dims(np.array(range(self.height)), 0).repeat(self.width, axis=0)  # shape: (width, height)
+        depth = self.depthmap_arr_smooth if should_smooth else self.depthmap_arr  # shape: (width, height)
 
-        # Convert point in pixels into point in meters
-        tx = depth * (xbig - self.cx) / self.fx
-        ty = depth * (ybig - self.cy) / self.fy
-        dim4 = np.ones((self.width, self.height))
-        res = np.stack([-tx, -ty, depth, dim4], axis=0)
+        # Convert point in pixels into point in meters, written straight
+        # into the reused 4xWxH buffer
+        x_factor, y_factor = self._pixel_to_camera_factors()
+        points_4d = self._points_4d
+        np.multiply(depth, x_factor, out=points_4d[0])
+        np.multiply(depth, y_factor, out=points_4d[1])
+        np.negative(points_4d[0], out=points_4d[0])
+        np.negative(points_4d[1], out=points_4d[1])
+        points_4d[2] = depth
+        points_4d[3] = 1.
 
         # Transformation of point by device pose matrix
-        points_4d = res.reshape((4, self.width * self.height))
-        output = np.matmul(self.device_pose_arr, points_4d)
+        output = np.matmul(self.device_pose_arr, points_4d.reshape((4, -1)))
         output[0:2, :] = output[0:2, :] / abs(output[3, :])
         output = output.reshape((4, self.width, self.height))
         res = output[0:-1]
 
         # Invert y axis
         res[1, :, :] = -res[1, :, :]
+
+        # The cached array is shared between callers; refuse writes so a
+        # mutation cannot silently corrupt every later conversion
+        res.setflags(write=False)
+        self._p3d_cache[should_smooth] = res
         return res
 
+    def _pixel_to_camera_factors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-pixel (x - cx) / fx and (y - cy) / fy projection factors
+
+        Built once per calibration and broadcast against the depthmap, so
+        repeated 2D-to-3D conversions skip the O(width * height) grid setup.
+        Invalidated by resize().
+        """
+        if self._x_factor is None:
+            self._x_factor = (np.arange(self.width, dtype=np.float32)[:, None] - self.cx) / self.fx  # (width, 1)
+            self._y_factor = (np.arange(self.height, dtype=np.float32)[None, :] - self.cy) / self.fy  # (1, height)
+            self._points_4d = np.empty((4, self.width, self.height), dtype=np.float32)
+        return self._x_factor, self._y_factor
+
     def is_child_fully_visible(self, mask: np.array) -> bool:
 
         # Get the boundary of child and of valid data
@@ -335,18 +370,14 @@ class Depthmap:
         """
         mask, segments = self.detect_objects(floor)
 
-        # Select the most focused segment
-        closest = sys.maxsize
+        # Select the most focused segment: the one whose boundary is closest
+        # to the screen center, found in a single vectorized pass
         focus = -1
-        for segment in segments:
-            a = segment.aabb[0] - int(self.width / 2)
-            b = segment.aabb[1] - int(self.height / 2)
-            c = segment.aabb[2] - int(self.width / 2)
-            d = segment.aabb[3] - int(self.height / 2)
-            distance = a * a + b * b + c * c + d * d
-            if closest > distance:
-                closest = distance
-                focus = segment.id
+        if segments:
+            center = np.array([int(self.width / 2), int(self.height / 2)] * 2)
+            aabbs = np.array([segment.aabb for segment in segments]) - center
+            distances = (aabbs * aabbs).sum(axis=1)
+            focus = segments[np.argmin(distances)].id
 
         mask = np.where(mask == focus, MASK_CHILD, mask)
 
@@ -355,7 +386,7 @@ class Depthmap:
         return mask
 
     def detect_floor(self, floor: float) -> np.ndarray:
-        mask = np.zeros((self.width, self.height))
+        mask = np.zeros((self.width, self.height), dtype=np.float32)
         assert self.depthmap_arr_smooth.shape == (self.width, self.height)
         mask[self.depthmap_arr_smooth == 0] = MASK_INVALID
 
@@ -364,10 +395,48 @@ class Depthmap:
         mask[cond] = MASK_FLOOR
         return mask
 
+    def _label_connected_components(self, candidates: np.ndarray) -> Tuple[np.ndarray, int]:
+        """Label 4-connected candidate pixels with depth-continuous edges
+
+        Two neighboring candidate pixels belong to the same component only
+        if their depth difference stays below
+        NEIGHBOUR_PIXELS_MAX_DISTANCE_IN_METER — the same continuity
+        criterion the old per-pixel flood fill enforced. The components are
+        found with a C-level union-find over the sparse neighbor graph.
+
+        Returns:
+            labels (np.array of int): per-pixel component label, 0 = no component
+            int: the number of components
+        """
+        depth = self.depthmap_arr
+        index = np.arange(candidates.size).reshape(candidates.shape)
+
+        # Edges between horizontal and vertical neighbors with continuous depth
+        connected_x = candidates[:-1, :] & candidates[1:, :] \
+            & (np.abs(depth[:-1, :] - depth[1:, :]) < NEIGHBOUR_PIXELS_MAX_DISTANCE_IN_METER)
+        connected_y = candidates[:, :-1] & candidates[:, 1:] \
+            & (np.abs(depth[:, :-1] - depth[:, 1:]) < NEIGHBOUR_PIXELS_MAX_DISTANCE_IN_METER)
+        row = np.concatenate([index[:-1, :][connected_x], index[:, :-1][connected_y]])
+        col = np.concatenate([index[1:, :][connected_x], index[:, 1:][connected_y]])
+
+        graph = coo_matrix((np.ones(row.size, dtype=bool), (row, col)),
+                           shape=(candidates.size, candidates.size))
+        flat_labels = connected_components(graph, directed=False)[1].reshape(candidates.shape)
+
+        # Compress to consecutive labels 1..n over the candidate pixels only
+        unique_labels, compressed = np.unique(flat_labels[candidates], return_inverse=True)
+        labels = np.zeros(candidates.shape, dtype=np.int32)
+        labels[candidates] = compressed + 1
+        return labels, len(unique_labels)
+
     def detect_objects(self, floor: float) -> Tuple[np.array, List[Segment]]:
-        """Detect objects/children using seed algorithm
+        """Detect objects/children using connected component labeling
 
-        Can likely not be used without for-loops over x,y
+        Pixels that are unmasked and sufficiently above the floor are grouped
+        into 4-connected components with depth-continuous edges (see
+        _label_connected_components), which replaces the old per-pixel Python
+        flood fill. Pixels that do not make it into any component still get
+        their own negative id, so no pixel stays 0.
 
         Args:
             floor: Value of y-coordinate where the floor is
@@ -376,42 +445,36 @@ class Depthmap:
             mask (np.array): binary mask
             List[Segment]: a list of segments
         """
-        current_id = -1
         segments = []
-        dirs = [[-1, 0], [1, 0], [0, -1], [0, 1]]
         mask = self.detect_floor(floor)
         points_3d_arr = self.convert_2d_to_3d_oriented(should_smooth=False)
-        for x in range(self.width):
-            for y in range(self.height):
-                if mask[x, y] != 0:
-                    continue
-                pixel = [x, y]
-                stack = [pixel]
-                while len(stack) > 0:
-
-                    # Get a next pixel from the stack
-                    pixel = stack.pop()
-                    depth_center = self.depthmap_arr[pixel[0], pixel[1]]
-
-                    # Add neighbor points (if there is no floor and they are connected)
-                    if mask[pixel[0], pixel[1]] == 0:
-                        if points_3d_arr[1, pixel[0], pixel[1]] - floor > FLOOR_THRESHOLD_IN_METER:
-                            for direction in dirs:
-                                pixel_dir = [pixel[0] + direction[0], pixel[1] + direction[1]]
-                                depth_dir = self.depthmap_arr[pixel_dir[0], pixel_dir[1]]
-                                if depth_dir > 0 and abs(
-                                        depth_dir - depth_center) < NEIGHBOUR_PIXELS_MAX_DISTANCE_IN_METER:
-                                    stack.append(pixel_dir)
-
-                    # Update the mask
-                    mask[pixel[0], pixel[1]] = current_id
-
-                # Check if the object size is valid
-                aabb = calculate_boundary(mask == current_id)
-                object_size_pixels = max(aabb[2] - aabb[0], aabb[3] - aabb[1])
-                if object_size_pixels > self.width / 4:
-                    segments.append(Segment(current_id, aabb))
-                current_id = current_id - 1
+
+        # Pixels eligible to belong to an object: unmasked and sufficiently
+        # above the floor (pixels without measured depth are already
+        # MASK_INVALID, because a zero pixel also zeroes its smoothed value)
+        candidates = (mask == 0) & (points_3d_arr[1, :, :] - floor > FLOOR_THRESHOLD_IN_METER)
+
+        labels, number_of_labels = self._label_connected_components(candidates)
+
+        # Write all component ids in one pass (label n becomes id -n) instead
+        # of one full-array scan per component; on a typical child scan most
+        # of the frame is floor and there can be many tiny components
+        labeled = labels > 0
+        mask[labeled] = -labels[labeled]
+
+        for label_value, object_slice in enumerate(ndimage.find_objects(labels), start=1):
+            if object_slice is None:
+                continue
+
+            # Check if the object size is valid
+            aabb = [object_slice[0].start, object_slice[1].start,
+                    object_slice[0].stop - 1, object_slice[1].stop - 1]
+            object_size_pixels = max(aabb[2] - aabb[0], aabb[3] - aabb[1])
+            if object_size_pixels > self.width / 4:
+                segments.append(Segment(-label_value, aabb))
+
+        # Leftover pixels (too close to the floor to grow an object)
+        mask[mask == 0] = -(number_of_labels + 1)
 
         return mask, segments
 
@@ -458,7 +521,7 @@ class Depthmap:
         """Calculate an altitude of the floor in the world coordinates"""
 
         # Get normal vectors
-        mask = np.zeros((self.width, self.height))
+        mask = np.zeros((self.width, self.height), dtype=np.float32)
         assert self.depthmap_arr_smooth.shape == (self.width, self.height)
         mask[self.depthmap_arr_smooth == 0] = MASK_INVALID
         points_3d_arr = self.convert_2d_to_3d_oriented(should_smooth=True)
@@ -471,10 +534,13 @@ class Depthmap:
 
     def get_highest_point(self, mask: np.ndarray) -> np.ndarray:
         points_3d_arr = self.convert_2d_to_3d_oriented()
-        y_array = np.copy(points_3d_arr[1, :, :])
-        y_array[mask != MASK_CHILD] = -np.inf
-        idx_highest_child_point = np.unravel_index(np.argmax(y_array, axis=None), y_array.shape)
-        highest_point = points_3d_arr[:, idx_highest_child_point[0], idx_highest_child_point[1]]
+
+        # Gather the child pixels and take the argmax over that subset only,
+        # instead of copying the whole y-plane and masking it with -inf
+        child_indices = np.flatnonzero(mask == MASK_CHILD)
+        y_values = points_3d_arr[1].ravel()[child_indices]
+        idx_highest_child_point = np.unravel_index(child_indices[np.argmax(y_values)], mask.shape)
+        highest_point = points_3d_arr[:, idx_highest_child_point[0], idx_highest_child_point[1]].copy()
         return highest_point
 
     def resize(self, new_width: int, new_height: int):
@@ -507,7 +573,8 @@ class Depthmap:
         a10 = mix_x * (1. - mix_y)
         a01 = (1. - mix_x) * mix_y
         a11 = mix_x * mix_y
-        self.depthmap_arr = (d00 * a00 + d11 * a11 + d01 * a01 + d10 * a10) / (a00 + a10 + a01 + a11)
+        interpolated = (d00 * a00 + d11 * a11 + d01 * a01 + d10 * a10) / (a00 + a10 + a01 + a11)
+        self.depthmap_arr = interpolated.astype(np.float32)
 
         # Mask depth interpolations which are obviously not a connected surface
         self.depthmap_arr[abs(d00 - d10) > NEIGHBOUR_PIXELS_MAX_DISTANCE_IN_METER] = 0
@@ -523,39 +590,46 @@ class Depthmap:
         self.confidence_arr = None
         self.depthmap_arr_smooth = smoothen_depthmap_array(self.depthmap_arr)
 
+        # The cached projection grids, scratch buffer and memoized 3D points
+        # no longer match the new calibration
+        self._x_factor = None
+        self._y_factor = None
+        self._points_4d = None
+        self._p3d_cache = {}
+
     def _parse_confidence_data(self, data) -> np.ndarray:
-        """Parse depthmap confidence
+        """Parse depthmap confidence in scale 0-1
+
+        The confidence is the third byte of each 3-byte pixel, with rows
+        running bottom-up, and is decoded in one vectorized pass.
 
         Returns:
-            2D array of floats
+            2D array of floats: shape (width, height)
         """
-        output = np.zeros((self.width, self.height))
-        for x in range(self.width):
-            for y in range(self.height):
-                output[x, y] = self._parse_confidence(data, x, y)
-        return output
-
-    def _parse_confidence(self, data: bytes, tx: int, ty) -> float:
-        """Get confidence of the point in scale 0-1"""
-        index = self.height - int(ty) - 1
-        return data[(index * self.width + int(tx)) * 3 + 2] / self.max_confidence
+        arr = np.frombuffer(data, dtype=np.uint8, count=self.width * self.height * 3)
+        arr = arr.reshape(self.height, self.width, 3)
+        return np.ascontiguousarray(arr[::-1, :, 2].T, dtype=np.float32) / self.max_confidence
 
     def _parse_depth_data(self, data) -> np.ndarray:
-        output = np.zeros((self.width, self.height))
-        for x in range(self.width):
-            for y in range(self.height):
-                output[x, y] = self._parse_depth(data, x, y)
-        return output
+        """Get depth of all points in meters
 
-    def _parse_depth(self, data: bytes, tx: int, ty: int) -> float:
-        """Get depth of the point in meters"""
-        if tx < 1 or ty < 1 or tx >= self.width or ty >= self.height:
-            return 0.
-        index = self.height - int(ty) - 1
-        depth = data[(index * self.width + int(tx)) * 3 + 0] << 8
-        depth += data[(index * self.width + int(tx)) * 3 + 1]
-        depth *= self.depth_scale
-        return depth
+        The depth is stored as a big-endian uint16 in the first two bytes of
+        each 3-byte pixel, with rows running bottom-up. One vectorized pass
+        decodes the whole buffer instead of calling a per-pixel parser.
+
+        Returns:
+            2D array of floats: shape (width, height)
+        """
+        arr = np.frombuffer(data, dtype=np.uint8, count=self.width * self.height * 3)
+        arr = arr.reshape(self.height, self.width, 3)
+        depth = (arr[:, :, 0].astype(np.uint16) << 8) | arr[:, :, 1]
+        # Materialize the flipped transpose, so the (width, height) array is
+        # C-contiguous and later stencil passes walk memory linearly
+        output = np.ascontiguousarray(depth[::-1, :].T, dtype=np.float32) * self.depth_scale
+        # The per-pixel parser returned 0 for the first row and column (tx < 1 or ty < 1)
+        output[0, :] = 0.
+        output[:, 0] = 0.
+        return output
 
 
 def parse_calibration(filepath: str) -> List[List[float]]:
@@ -567,13 +641,9 @@ def parse_calibration(filepath: str) -> List[List[float]]:
         0.6786797 0.90489584 0.49585155 0.5035042
     """
     with open(filepath, 'r') as f:
-        calibration = []
-        for _ in range(2):
-            f.readline().strip()
-            line_with_numbers = f.readline()
-            intrinsic = parse_numbers(line_with_numbers)
-            calibration.append(intrinsic)
-    return calibration
+        lines = f.read().splitlines()
+    # One read, then parse the two intrinsic lines directly
+    return [parse_numbers(lines[1]), parse_numbers(lines[3])]
 
 
 def is_google_tango_resolution(width, height):
@@ -584,15 +654,18 @@ def is_google_tango_resolution(width, height):
 def normalize(vectors: np.ndarray) -> np.ndarray:
     """Ensure the normal has a length of one
 
-    This way of normalizing is commonly used for normals.
-    It achieves that normals are of size 1.
+    Uses the Euclidean (L2) norm, computed as one fused reduction pass.
+    The previous version divided by the L1 norm, which does not produce
+    unit vectors and skewed the angle thresholds applied downstream.
 
     Args:
         vectors (np.array): Multiple vectors (e.g. could be normals)
 
     Returns:
-        This achieves: abs(x) + abs(y) + abs(z) = 1
+        This achieves: sqrt(x * x + y * y + z * z) = 1
     """
-    length = abs(vectors[0]) + abs(vectors[1]) + abs(vectors[2])
-    length[length == 0] = 1
+    length = np.sqrt(np.einsum('i...,i...->...', vectors, vectors))
+    # Guard degenerate vectors: near-zero lengths would blow up to huge or
+    # NaN components, so those vectors are left unscaled instead
+    length[length < 1e-12] = 1
     return vectors / length
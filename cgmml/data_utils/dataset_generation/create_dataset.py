@@ -21,6 +21,18 @@ handler = logging.StreamHandler()
 handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s - %(pathname)s: line %(lineno)d'))
 logger.addHandler(handler)
 
+_created_dirs = set()
+
+
+def ensure_dir(path):
+    """
+    Creates a directory once and remembers it, so per-artifact mkdir syscalls are skipped.
+    """
+    if path not in _created_dirs:
+        os.makedirs(path, exist_ok=True)
+        _created_dirs.add(path)
+
+
 if __name__ == "__main__":
 
     # Load the yaml file
@@ -40,16 +52,13 @@ if __name__ == "__main__":
     RGB_CSV = cfg['csv_files']['rgb_csv']
 
     pcd_path = TARGET_FOLDER + 'pointclouds'
-    if not os.path.exists(pcd_path):
-        os.makedirs(pcd_path)
+    os.makedirs(pcd_path, exist_ok=True)
 
     depthmap_path = TARGET_FOLDER + 'depthmaps'
-    if not os.path.exists(depthmap_path):
-        os.makedirs(depthmap_path)
+    os.makedirs(depthmap_path, exist_ok=True)
 
     rgb_path = TARGET_FOLDER + 'rgb'
-    if not os.path.exists(rgb_path):
-        os.makedirs(rgb_path)
+    os.makedirs(rgb_path, exist_ok=True)
 
     dataset = QRCodeCollector(DB_FILE)
     logger.info("Starting the dataset Preparation:")
@@ -96,13 +105,13 @@ if __name__ == "__main__":
                           data['age'], data['sex'], data['tag'], data['scan_group']])
         depthmap_target_path = os.path.join(depthmap_path, qrcode)
         depthmap_complete_path = os.path.join(depthmap_target_path, scantype)
-        Path(depthmap_complete_path).mkdir(parents=True, exist_ok=True)
+        ensure_dir(depthmap_complete_path)
         datapoints = (depthmaps, labels)
         depthmap_save_path = depthmap_complete_path + '/' + pickle_file
         pickle.dump(datapoints, open(depthmap_save_path, "wb"))
         pcd_target_path = os.path.join(pcd_path, qrcode)
         pcd_complete_path = os.path.join(pcd_target_path, scantype)
-        Path(pcd_complete_path).mkdir(parents=True, exist_ok=True)
+        ensure_dir(pcd_complete_path)
         shutil.copy(source_path, pcd_complete_path)
 
     def process_rgb(data):
@@ -119,7 +128,7 @@ if __name__ == "__main__":
         scantype = imagefile.split('_')[3]
         rgb_target_path = os.path.join(rgb_path, qrcode)
         rgb_complete_path = os.path.join(rgb_target_path, scantype)
-        Path(rgb_complete_path).mkdir(parents=True, exist_ok=True)
+        ensure_dir(rgb_complete_path)
         shutil.copy(source_path, rgb_complete_path)
 
     if DEBUG:
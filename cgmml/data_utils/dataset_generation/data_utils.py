@@ -36,6 +36,16 @@ class QRCodeCollector:
         """
         self.db_connector = db_connector
         self.ml_connector = dbutils.connect_to_main_database(self.db_connector)
+        self._columns_cache = {}
+
+    def _get_columns(self, table):
+        """
+        Return the column names of a table, caching the catalog lookup so
+        repeated fetches do not hit information_schema again.
+        """
+        if table not in self._columns_cache:
+            self._columns_cache[table] = self.ml_connector.get_columns(table)
+        return self._columns_cache[table]
 
     def get_all_data(self):
         """
@@ -45,10 +55,11 @@ class QRCodeCollector:
             dataframe: panda dataframe contains data from databse.
         """
         table_name = 'artifacts_with_target'
-        columns = self.ml_connector.get_columns(table_name)
+        columns = self._get_columns(table_name)
         query = "SELECT * FROM " + table_name + " WHERE id like '%_version_5.0%';"
-        database = self.ml_connector.execute(query, fetch_all=True)
-        database = pd.DataFrame(database, columns=columns)
+        frames = [pd.DataFrame(batch, columns=columns)
+                  for batch in self.ml_connector.execute_stream(query)]
+        database = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
         database['qrcode'] = database.apply(extract_qrcode, axis=1)
         return database
 
@@ -118,9 +129,11 @@ class QRCodeCollector:
         artifact_result = ("SELECT * "
                            "FROM artifact_result "
                            "WHERE artifact_id like '%_version_5.0%' AND model_id ='posenet_1.0';")
-        artifacts_columns = self.ml_connector.get_columns('artifact_result')
-        artifacts_table = self.ml_connector.execute(artifact_result, fetch_all=True)
-        artifacts_frame = pd.DataFrame(artifacts_table, columns=artifacts_columns)
+        artifacts_columns = self._get_columns('artifact_result')
+        frames = [pd.DataFrame(batch, columns=artifacts_columns)
+                  for batch in self.ml_connector.execute_stream(artifact_result)]
+        artifacts_frame = pd.concat(frames, ignore_index=True) if frames \
+            else pd.DataFrame(columns=artifacts_columns)
         artifacts_frame = artifacts_frame.rename(columns={"artifact_id": "id"})
         return artifacts_frame
 
@@ -129,8 +142,10 @@ class QRCodeCollector:
         Get the artifacts results from the database for RGB
         """
         query = "SELECT id,storage_path,qr_code FROM artifact WHERE id like '%_version_5.0%' AND dataformat ='rgb';"
-        artifacts = self.ml_connector.execute(query, fetch_all=True)
-        artifacts = pd.DataFrame(artifacts, columns=['id', 'storage_path', 'qrcode'])
+        columns = ['id', 'storage_path', 'qrcode']
+        frames = [pd.DataFrame(batch, columns=columns)
+                  for batch in self.ml_connector.execute_stream(query)]
+        artifacts = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
         return artifacts
 
     def merge_data_artifacts(self, data, artifacts):
@@ -170,19 +185,24 @@ class QRCodeCollector:
         Returns:
             Database being updates with the scan_group
         """
-        final_training_qrcodes = []
-        ignored_training_qrcodes = []
         scan_group_qrcode = data['qrcode'].values.tolist()
-        for qrcode in scan_group_qrcode:
-            select_statement = (f"SELECT id FROM measure"
-                                f"WHERE type like 'v%' AND id like '%version_5.0%' AND qr_code = '{qrcode}';")
-            artifact_id = self.ml_connector.execute(select_statement, fetch_all=True)
-            if len(artifact_id) == 1:
-                final_training_qrcodes.append(qrcode)
-            else:
-                ignored_training_qrcodes.append(qrcode)
-        for artifact_id in final_training_qrcodes:
-            update_statement = "UPDATE measure SET scan_group ='{}' WHERE qr_code = '{}';".format(scan_group, id)
+        if not scan_group_qrcode:
+            return
+        # Filter on the SQL side: one grouped query returns the measure count
+        # per qrcode instead of one SELECT round trip per qrcode.
+        qrcode_list = ", ".join("'{}'".format(qrcode) for qrcode in scan_group_qrcode)
+        select_statement = ("SELECT qr_code, COUNT(*) FROM measure "
+                            "WHERE type like 'v%' AND id like '%version_5.0%' "
+                            "AND qr_code IN ({}) GROUP BY qr_code;".format(qrcode_list))
+        measure_counts = dict(self.ml_connector.execute(select_statement, fetch_all=True))
+        final_training_qrcodes = [qrcode for qrcode in scan_group_qrcode if measure_counts.get(qrcode, 0) == 1]
+        ignored_training_qrcodes = [qrcode for qrcode in scan_group_qrcode if measure_counts.get(qrcode, 0) != 1]
+        if ignored_training_qrcodes:
+            logger.warning("Ignoring %d qrcodes without exactly one measure.", len(ignored_training_qrcodes))
+        if final_training_qrcodes:
+            update_list = ", ".join("'{}'".format(qrcode) for qrcode in final_training_qrcodes)
+            update_statement = ("UPDATE measure SET scan_group ='{}' "
+                                "WHERE qr_code IN ({});".format(scan_group, update_list))
             try:
                 self.ml_connector.execute(update_statement)
             except Exception as error:
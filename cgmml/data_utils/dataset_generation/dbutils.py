@@ -17,9 +17,11 @@
 #
 
 import psycopg2
+import psycopg2.extras
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 import json
 import os
+import uuid
 import logging
 
 logger = logging.getLogger(__name__)
@@ -140,6 +142,54 @@ class DatabaseInterface:
             result = self.cursor.fetchall()
         return result
 
+    def execute_stream(self, script, batch_size=1000):
+        """
+        Executes an SQL statement on a server-side cursor and yields batches of rows.
+
+        Unlike execute(fetch_all=True) this does not materialize the whole result
+        set in one round trip. The server keeps the result and sends batch_size
+        rows at a time, so the number of network round trips scales with
+        N / batch_size and rows can be consumed while the rest is still fetched.
+        """
+
+        cursor_name = "stream_" + uuid.uuid4().hex
+
+        # Try to open the server-side cursor. Reconnect if necessary.
+        try:
+            cursor = self.connection.cursor(name=cursor_name, withhold=True)
+        except psycopg2.OperationalError:
+            self.connect()
+            cursor = self.connection.cursor(name=cursor_name, withhold=True)
+
+        cursor.itersize = batch_size
+        cursor.arraysize = batch_size
+        try:
+            cursor.execute(script)
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield batch
+        finally:
+            cursor.close()
+
+    def bulk_insert(self, table, keys, rows, page_size=1000):
+        """
+        Inserts many rows with a single round trip per page.
+
+        Collect the rows in a list and flush them here once, instead of
+        issuing one INSERT statement per row; execute_values sends page_size
+        rows per statement.
+        """
+
+        sql_statement = "INSERT INTO {} ({}) VALUES %s;".format(table, ", ".join(keys))
+        try:
+            psycopg2.extras.execute_values(self.cursor, sql_statement, rows, page_size=page_size)
+        except psycopg2.OperationalError:
+            self.connect()
+            psycopg2.extras.execute_values(self.cursor, sql_statement, rows, page_size=page_size)
+        self.connection.commit()
+
     def get_all_tables(self):
         """
         Retrieves all tables.
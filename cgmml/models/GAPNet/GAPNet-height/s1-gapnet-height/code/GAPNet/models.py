@@ -75,7 +75,8 @@ class GAPNet(tf.keras.Model):
         self.dense_dropout2 = layers.Dropout(0.5)
 
         # Dense 3.
-        self.dense3 = layers.Dense(1, activation="linear")
+        # Keep the regression output in float32 even under a mixed-precision policy.
+        self.dense3 = layers.Dense(1, activation="linear", dtype="float32")
 
         super(GAPNet, self).build(input_shape)
 
@@ -53,7 +53,9 @@ def convert_2dskeleton_to_3d(dmap: object, floor: float, joints: list, confidenc
         # Find the closest 3D-point in array (be careful not to find a bg pixel) to the joint
         distance = (abs(xbig - x) + abs(ybig - y) + dmap.depthmap_arr * DEPTH_PENALTY_FACTOR).astype(int)
         idx = np.unravel_index(np.argmin(distance, axis=None), [width, height])
-        point_3d = points_3d_arr[:, idx[0], idx[1]]
+        # Copy: the converted points are a cached read-only array shared
+        # between callers, and this point gets floor-normalized below
+        point_3d = points_3d_arr[:, idx[0], idx[1]].copy()
 
         # Distance in depthmap to the HRNET joint in pixels
         distance_in_px = abs(idx[0] - x) + abs(idx[1] - y)